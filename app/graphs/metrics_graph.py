@@ -1,19 +1,9 @@
 import os
-import sys
-
-current_file_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_file_dir)
-
-if parent_dir not in sys.path:
-    sys.path.insert(0, parent_dir)
-
-
-from dataclasses import field
-from typing import List, TypedDict
+from dataclasses import dataclass, field
+from typing import List
 
 from langchain_core.messages import AnyMessage
 from langchain_core.runnables.config import RunnableConfig
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.types import Command
@@ -22,21 +12,28 @@ from src.agents import (
     question_rewriter_agent,
     rag_chain_agent,
 )
+from src.checkpointer import compressed_memory_saver
 from src.logger_initialization import initialize_logger
 from src.parsing_utils import (
-    add_credibility_web_search,
+    apply_credibility,
     create_retriever_in_memory,
     exa_search_results,
+    index_with_credibility,
     retrieve_with_credibility,
 )
+from src.prompt_budget import fit_to_budget
+from src.semantic_cache import cached_or_call, query_key
 from typing_extensions import Annotated, Literal
 
 logger = initialize_logger("main_graph")
 MAX_RETRIES = 1
+# Log full generations only when explicitly requested
+TRACE_PAYLOADS = os.getenv("TRACE_PAYLOADS") == "1"
 
 
 ## Creating graph
-class GraphState(TypedDict):
+@dataclass(slots=True)
+class GraphState:
     """
     Represents the state of our graph.
 
@@ -47,7 +44,9 @@ class GraphState(TypedDict):
         retry_count: retry count initialized to 0
     """
 
-    messages_list: Annotated[list[AnyMessage], add_messages]
+    messages_list: Annotated[list[AnyMessage], add_messages] = field(
+        default_factory=list
+    )
     company_name: str = ""
     question: str = ""
 
@@ -58,6 +57,7 @@ class GraphState(TypedDict):
     test_count: int = 0
     parameters: List[str] = field(default_factory=list)
     web_results: List[str] = field(default_factory=list)
+    tried_queries: List[str] = field(default_factory=list)
 
 
 async def retries_increment_node(
@@ -65,7 +65,7 @@ async def retries_increment_node(
 ) -> Command[Literal["question_rewriter_node", END]]:
     thread_id = config["configurable"]["thread_id"]
 
-    retry_count = state.get("retry_count", 0)
+    retry_count = state.retry_count
     incremented_retry_count = retry_count + 1
 
     logger.info(
@@ -96,8 +96,8 @@ async def full_answer_check_node(
 ) -> Command[Literal[END, "retries_increment_node"]]:
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Full answer check")
-    question = state["question"]
-    generation = state["generation"]
+    question = state.question
+    generation = state.generation
 
     # Invoke the grading function
     input_prompt = f"User question: \n\n {question} \n\n LLM generation: {generation}"
@@ -131,30 +131,40 @@ async def generate_answer_node(state, config: RunnableConfig):
     """
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Generate")
-    question = state["question"]
-    documents = state["documents"]
+    question = state.question
+    # Trim the ranked documents to the prompt token budget
+    documents = fit_to_budget(state.documents)
 
     # RAG generation
     input_prompt = f"Question: {question}\nDocuments: {documents}"
     result = await rag_chain_agent.run(input_prompt)
     generation = result.output
-    logger.info(f"Thread: {thread_id} - Generation: {generation}")
+    if TRACE_PAYLOADS:
+        logger.info("Thread: %s - Generation: %s", thread_id, generation)
     return {"generation": generation}
 
 
-async def question_rewriter_node(state, config: RunnableConfig):
+async def question_rewriter_node(
+    state, config: RunnableConfig
+) -> Command[Literal["web_search_node", END]]:
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Generate")
-    question = state["question"]
-    follow_up_question = state["follow_up_question"]
-    documents = state["documents"]
+    question = state.question
+    follow_up_question = state.follow_up_question
+    documents = state.documents
 
     # RAG generation
     input_prompt = f"Question: {question} \nFollow-up question: {follow_up_question} \nDocument: {documents[:1]}"
     result = await question_rewriter_agent.run(input_prompt)
     new_question = result.output.updated_query
     logger.info(f"Thread: {thread_id} - New question: {new_question}")
-    return {"question": new_question}
+
+    # The same search was already done in this thread, nothing new to find
+    if query_key(new_question) in state.tried_queries:
+        logger.info(f"Thread: {thread_id} - Question already searched, stop")
+        return Command(goto=END)
+
+    return Command(update={"question": new_question}, goto="web_search_node")
 
 
 async def web_search_node(state, config: RunnableConfig):
@@ -170,19 +180,37 @@ async def web_search_node(state, config: RunnableConfig):
 
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Web search")
-    question = state["question"]
+    question = state.question
     # Web search
 
-    web_results = await exa_search_results(question)
-    logger.info(f"Thread: {thread_id} - Exa search done")
-    web_results = await add_credibility_web_search(web_results, question)
-    logger.info(f"Thread: {thread_id} - Credibility done")
+    # Set when the search runs, a cache hit leaves the results to be indexed below
+    vector_store = None
+
+    async def search_with_credibility():
+        nonlocal vector_store
+        web_results = await exa_search_results(question)
+        logger.info(f"Thread: {thread_id} - Exa search done")
+        # Credibility grading runs while the same results are embedded
+        web_results, vector_store = await index_with_credibility(
+            web_results, question, thread_id=thread_id
+        )
+        logger.info(f"Thread: {thread_id} - Credibility and retriever done")
+        return web_results
+
+    # Repeated questions reuse cached Exa results and credibility scores; only exact
+    # matches, since near-duplicates may differ in the company or year asked about
+    web_results = await cached_or_call(
+        question, search_with_credibility, threshold=None
+    )
 
     if web_results:
-        logger.info(f"Thread: {thread_id} - Creating retriever in memory...")
-        vector_store = create_retriever_in_memory(web_results)
+        if vector_store is None:
+            # Cached results still need to be indexed for this thread
+            logger.info(f"Thread: {thread_id} - Creating retriever in memory...")
+            vector_store = create_retriever_in_memory(web_results, thread_id=thread_id)
 
         if vector_store is not None:
+            apply_credibility(vector_store, web_results)
             logger.info(
                 f"Thread: {thread_id} - Retrieving documents from the vectorstore..."
             )
@@ -194,7 +222,18 @@ async def web_search_node(state, config: RunnableConfig):
     else:
         documents_web = []
 
-    return {"documents": documents_web, "web_results": web_results}
+    return {
+        "documents": documents_web,
+        "web_results": web_results,
+        "tried_queries": state.tried_queries + [query_key(question)],
+    }
+
+
+def route_after_generation(state) -> Literal["full_answer_check_node", END]:
+    """Skip the answer check when a failed check could not trigger another retry."""
+    if state.retry_count >= MAX_RETRIES - 1:
+        return END
+    return "full_answer_check_node"
 
 
 workflow = StateGraph(GraphState)
@@ -211,11 +250,9 @@ workflow.add_node("question_rewriter_node", question_rewriter_node)
 workflow.add_edge(START, "web_search_node")
 
 workflow.add_edge("web_search_node", "generate_answer_node")
-workflow.add_edge("generate_answer_node", "full_answer_check_node")
-
-workflow.add_edge("question_rewriter_node", "web_search_node")
+workflow.add_conditional_edges("generate_answer_node", route_after_generation)
 
-checkpointer = InMemorySaver()
+checkpointer = compressed_memory_saver()
 
 # Compile
 websearch_graph = workflow.compile(checkpointer=checkpointer)
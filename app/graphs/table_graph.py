@@ -1,18 +1,8 @@
 import os
-import sys
-
-current_file_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_file_dir)
-
-if parent_dir not in sys.path:
-    sys.path.insert(0, parent_dir)
-
-
-from dataclasses import field
-from typing import List, TypedDict
+from dataclasses import dataclass, field
+from typing import List
 
 from langchain_core.runnables.config import RunnableConfig
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import END, START, StateGraph
 from langgraph.types import Command
 from src.agents import (
@@ -20,21 +10,28 @@ from src.agents import (
     full_information_grader_agent,
     question_rewriter_agent,
 )
+from src.checkpointer import compressed_memory_saver
 from src.logger_initialization import initialize_logger
 from src.parsing_utils import (
-    add_credibility_web_search,
+    apply_credibility,
     create_retriever_in_memory,
     exa_search_results,
+    index_with_credibility,
     retrieve_with_credibility,
 )
+from src.prompt_budget import fit_to_budget
+from src.semantic_cache import cached_or_call
 from typing_extensions import Literal
 
 logger = initialize_logger("table_graph")
 MAX_RETRIES = 1
+# Log full generations only when explicitly requested
+TRACE_PAYLOADS = os.getenv("TRACE_PAYLOADS") == "1"
 
 
 ## Creating graph
-class One_metricsGraphState(TypedDict):
+@dataclass(slots=True)
+class One_metricsGraphState:
     """
     Represents the state of our graph.
 
@@ -61,7 +58,7 @@ async def retries_increment_node(
 ) -> Command[Literal["question_rewriter_node", END]]:
     thread_id = config["configurable"]["thread_id"]
 
-    retry_count = state.get("retry_count", 0)
+    retry_count = state.retry_count
     incremented_retry_count = retry_count + 1
 
     logger.info(
@@ -92,10 +89,10 @@ async def full_answer_check_node(
 ) -> Command[Literal[END, "retries_increment_node"]]:
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Full answer check")
-    company_name = state["company_name"]
-    metrics = state["metrics"]
+    company_name = state.company_name
+    metrics = state.metrics
     question = f"Find {metrics} for {company_name}"
-    generation = state["generation"]
+    generation = state.generation
 
     # Invoke the grading function
     input_prompt = f"User question: \n\n {question} \n\n LLM generation: {generation}"
@@ -129,28 +126,30 @@ async def generate_structured_answer_node(state, config: RunnableConfig):
     """
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Generate")
-    company_name = state["company_name"]
-    metrics = state["metrics"]
+    company_name = state.company_name
+    metrics = state.metrics
     question = f"Find {metrics} for {company_name}"
 
-    documents = state["documents"]
+    # Trim the ranked documents to the prompt token budget
+    documents = fit_to_budget(state.documents)
 
     # RAG generation
     input_prompt = f"Question: {question} \nDocuments: {documents}"
     result = await company_metric_agent.run(input_prompt)
     generation = result.output.model_dump()
-    logger.info(f"Thread: {thread_id} - Generation: {generation}")
+    if TRACE_PAYLOADS:
+        logger.info("Thread: %s - Generation: %s", thread_id, generation)
     return {"generation": generation}
 
 
 async def question_rewriter_node(state, config: RunnableConfig):
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Generate")
-    company_name = state["company_name"]
-    metrics = state["metrics"]
+    company_name = state.company_name
+    metrics = state.metrics
     question = f"Find {metrics} for {company_name}"
-    follow_up_question = state["follow_up_question"]
-    documents = state["documents"]
+    follow_up_question = state.follow_up_question
+    documents = state.documents
 
     # RAG generation
     input_prompt = f"Question: {question} \nFollow-up question: {follow_up_question} \nDocument: {documents[:1]}"
@@ -173,21 +172,39 @@ async def web_search_node(state, config: RunnableConfig):
 
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Web search")
-    company_name = state["company_name"]
-    metrics = state["metrics"]
+    company_name = state.company_name
+    metrics = state.metrics
     question = f"Find {metrics} for {company_name}"
     # Web search
 
-    web_results = await exa_search_results(question)
-    logger.info(f"Thread: {thread_id} - Exa search done")
-    web_results = await add_credibility_web_search(web_results, question)
-    logger.info(f"Thread: {thread_id} - Credibility done")
+    # Set when the search runs, a cache hit leaves the results to be indexed below
+    vector_store = None
+
+    async def search_with_credibility():
+        nonlocal vector_store
+        web_results = await exa_search_results(question)
+        logger.info(f"Thread: {thread_id} - Exa search done")
+        # Credibility grading runs while the same results are embedded
+        web_results, vector_store = await index_with_credibility(
+            web_results, question, thread_id=thread_id
+        )
+        logger.info(f"Thread: {thread_id} - Credibility and retriever done")
+        return web_results
+
+    # Near-duplicate questions reuse cached Exa results and credibility scores; the
+    # template differs only by company and metric, so those must match exactly
+    web_results = await cached_or_call(
+        question, search_with_credibility, namespace=f"{company_name}\0{metrics}"
+    )
 
     if web_results:
-        logger.info(f"Thread: {thread_id} - Creating retriever in memory...")
-        vector_store = create_retriever_in_memory(web_results)
+        if vector_store is None:
+            # Cached results still need to be indexed for this thread
+            logger.info(f"Thread: {thread_id} - Creating retriever in memory...")
+            vector_store = create_retriever_in_memory(web_results, thread_id=thread_id)
 
         if vector_store is not None:
+            apply_credibility(vector_store, web_results)
             logger.info(
                 f"Thread: {thread_id} - Retrieving documents from the vectorstore..."
             )
@@ -202,6 +219,13 @@ async def web_search_node(state, config: RunnableConfig):
     return {"documents": documents_web, "web_results": web_results}
 
 
+def route_after_generation(state) -> Literal["full_answer_check_node", END]:
+    """Skip the answer check when a failed check could not trigger another retry."""
+    if state.retry_count >= MAX_RETRIES - 1:
+        return END
+    return "full_answer_check_node"
+
+
 workflow = StateGraph(One_metricsGraphState)
 
 # Define the nodes
@@ -218,11 +242,13 @@ workflow.add_node("question_rewriter_node", question_rewriter_node)
 workflow.add_edge(START, "web_search_node")
 
 workflow.add_edge("web_search_node", "generate_structured_answer_node")
-workflow.add_edge("generate_structured_answer_node", "full_answer_check_node")
+workflow.add_conditional_edges(
+    "generate_structured_answer_node", route_after_generation
+)
 
 workflow.add_edge("question_rewriter_node", "web_search_node")
 
-checkpointer = InMemorySaver()
+checkpointer = compressed_memory_saver()
 
 # Compile
 one_metrics_graph = workflow.compile(checkpointer=checkpointer)
@@ -1,28 +1,24 @@
+import asyncio
 import os
-import sys
-
-current_file_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_file_dir)
-
-if parent_dir not in sys.path:
-    sys.path.insert(0, parent_dir)
-
-
-from dataclasses import field
-from typing import List, TypedDict
+from dataclasses import dataclass, field
+from typing import List, Union
 
 from langchain_core.runnables.config import RunnableConfig
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import START, END, StateGraph
 from src.logger_initialization import initialize_logger
+from src.checkpointer import compressed_memory_saver
 from src.agents import company_metric_agent_with_websearch
 
 logger = initialize_logger("websearch_tool_graph")
 MAX_RETRIES = 1
+# Log full generations only when explicitly requested
+TRACE_PAYLOADS = os.getenv("TRACE_PAYLOADS") == "1"
+METRICS_MAX_CONCURRENCY = 4
 
 
 ## Creating graph
-class One_metricsGraphState(TypedDict):
+@dataclass(slots=True)
+class One_metricsGraphState:
     """
     Represents the state of our graph.
 
@@ -34,7 +30,7 @@ class One_metricsGraphState(TypedDict):
     """
 
     company_name: str = ""
-    metrics: str = ""
+    metrics: Union[str, List[str]] = ""
 
     generation: str = ""
     follow_up_question: str = ""
@@ -56,15 +52,25 @@ async def generate_structured_answer_node(state, config: RunnableConfig):
     """
     thread_id = config["configurable"]["thread_id"]
     logger.info(f"Thread: {thread_id} - Generate")
-    company_name = state["company_name"]
-    metrics = state["metrics"]
-    question = f"Find {metrics} for {company_name}"
-
-    # RAG generation
-    input_prompt = f"Question: {question}"
-    result = await company_metric_agent_with_websearch.run(input_prompt)
-    generation = result.output.model_dump()
-    logger.info(f"Thread: {thread_id} - Generation: {generation}")
+    company_name = state.company_name
+    metrics = state.metrics
+    # A single metric string is answered with a single generation, as before
+    metrics_list = [metrics] if isinstance(metrics, str) else list(metrics)
+    semaphore = asyncio.Semaphore(METRICS_MAX_CONCURRENCY)
+
+    async def answer_metric(metric):
+        question = f"Find {metric} for {company_name}"
+
+        # RAG generation
+        input_prompt = f"Question: {question}"
+        async with semaphore:
+            result = await company_metric_agent_with_websearch.run(input_prompt)
+        return result.output.model_dump()
+
+    generations = await asyncio.gather(*(answer_metric(m) for m in metrics_list))
+    generation = generations[0] if isinstance(metrics, str) else generations
+    if TRACE_PAYLOADS:
+        logger.info("Thread: %s - Generation: %s", thread_id, generation)
     return {"generation": generation}
 
 
@@ -79,7 +85,7 @@ workflow.add_edge(START, "generate_structured_answer_node")
 
 workflow.add_edge("generate_structured_answer_node", END)
 
-checkpointer = InMemorySaver()
+checkpointer = compressed_memory_saver()
 
 # Compile
 one_metrics_graph_tool = workflow.compile(checkpointer=checkpointer)
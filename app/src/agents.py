@@ -1,10 +1,14 @@
+import asyncio
 import os
+import weakref
 
+import httpx
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent
 from pydantic_ai.models.openai import OpenAIChatModel
 from pydantic_ai.providers.openai import OpenAIProvider
 from dotenv import load_dotenv
+from typing import List
 from typing import Optional
 from typing import Union
 from pydantic_ai.models.openai import OpenAIResponsesModel
@@ -12,20 +16,60 @@ from pydantic_ai import WebSearchTool
 
 load_dotenv()
 
-model_mini = OpenAIChatModel(
-    "gpt-4o-mini", provider=OpenAIProvider(api_key=os.getenv("OPENAI_API_KEY"))
-)
-model_4o = OpenAIChatModel(
-    "gpt-4o", provider=OpenAIProvider(api_key=os.getenv("OPENAI_API_KEY"))
-)
-model_5 = OpenAIChatModel(
-    "gpt-5", provider=OpenAIProvider(api_key=os.getenv("OPENAI_API_KEY"))
+# Connection pool limits of the HTTP/2 transport shared by every agent
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+
+
+class _PerLoopTransport(httpx.AsyncBaseTransport):
+    """
+    Dispatch requests to one pooled HTTP/2 transport per event loop.
+
+    Pooled connections are bound to the loop that opened them, so a single pool
+    breaks as soon as a second loop (another asyncio.run, a script, a test) uses it.
+    """
+
+    def __init__(self):
+        # Event loop -> transport, dropped once the loop is garbage collected
+        self._transports = weakref.WeakKeyDictionary()
+
+    def _get_transport(self):
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(
+                http2=True, limits=HTTP_LIMITS
+            )
+        return transport
+
+    async def handle_async_request(self, request):
+        return await self._get_transport().handle_async_request(request)
+
+    async def aclose(self):
+        # Only the running loop's pool can be closed from here
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+# One client and provider shared by every agent, pooling connections per loop
+shared_http_client = httpx.AsyncClient(
+    transport=_PerLoopTransport(),
+    timeout=httpx.Timeout(timeout=600, connect=5),
 )
-model_5_responses = OpenAIResponsesModel(
-    "gpt-5", provider=OpenAIProvider(api_key=os.getenv("OPENAI_API_KEY"))
+provider = OpenAIProvider(
+    api_key=os.getenv("OPENAI_API_KEY"), http_client=shared_http_client
 )
 
 
+model_mini = OpenAIChatModel("gpt-4o-mini", provider=provider)
+model_4o = OpenAIChatModel("gpt-4o", provider=provider)
+model_5 = OpenAIChatModel("gpt-5", provider=provider)
+model_5_responses = OpenAIResponsesModel("gpt-5", provider=provider)
+
+# Graders only emit a boolean and a short follow-up question
+grader_model_settings = {"temperature": 0.0, "max_tokens": 128}
+
+
 class GradeDocuments(BaseModel):
     """Binary score for relevance check on retrieved documents."""
 
@@ -46,17 +90,23 @@ retrieval_grader_agent = Agent(
     output_type=GradeDocuments,
 )
 
-system_prompt_rag = """
-## Role
-You are expert in analysis of financial statements and annual reports.
-Generate a direct and well-structured answer to the question, using only the provided sources.
+# Prompt blocks shared by the financial answer agents, kept byte-identical so the
+# provider can reuse cached prompt prefixes
+_ROLE_FINANCIAL = """## Role
+You are expert in analysis of financial statements and annual reports."""
 
-### Guidelines:
+_GUIDELINES = """### Guidelines:
 1. **Synthesize** details if multiple sources agree.
 2. **Prioritize higher credibility scores** if sources conflict.
 3. **Prioritize official sources, such as official websites, annual reports, etc.**
 4. **Cite sources explicitly** using *(According to [Title]( URL ))*.
-5. **Ensure clarity, accuracy, and neutrality.**
+5. **Ensure clarity, accuracy, and neutrality.**"""
+
+system_prompt_rag = f"""
+{_ROLE_FINANCIAL}
+Generate a direct and well-structured answer to the question, using only the provided sources.
+
+{_GUIDELINES}
 
 Now generate the answer."""
 
@@ -96,8 +146,8 @@ system_prompt_answer = """You are a grader assessing whether an answer addresses
 Return True if the answer addresses/resolves the question, False otherwise."""
 
 answer_grader_agent = Agent(
-    model_5,
-    model_settings={"temperature": 0.0},
+    model_mini,
+    model_settings=grader_model_settings,
     system_prompt=system_prompt_answer,
     output_type=GradeAnswer,
 )
@@ -119,8 +169,8 @@ system_prompt_full_info = """You are a grader assessing whether the provided ans
 If the answer is sufficient, return True. If not, return False and provide a specific follow-up question to the web to fill missing information."""
 
 full_information_grader_agent = Agent(
-    model_5,
-    model_settings={"temperature": 0.0},
+    model_mini,
+    model_settings=grader_model_settings,
     system_prompt=system_prompt_full_info,
     output_type=GradeAnswerFullInfo,
 )
@@ -148,27 +198,31 @@ question_rewriter_agent = Agent(
 )
 
 
-class WebCredibilityGrader(BaseModel):
-    credibility_score: float = Field(
-        description="Web search result score, based on source credibility and time of publication"
+_CREDIBILITY_CRITERIA = """    - Base this score (0.0 to 1.0) on:  
+        - Domain reliability (peer-reviewed, official, or trusted news source).  
+        - Author expertise (e.g., known expert vs. anonymous).  
+        - Recency (fresher content gets a higher score unless older info is more authoritative)."""
+
+
+class WebCredibilityBatchGrader(BaseModel):
+    credibility_scores: List[float] = Field(
+        description="One credibility score per numbered web search result, in the given order"
     )
 
 
-system_prompt_web_credibility = """You are an expert fact-checker and researcher. You will be given a URL as well as some URL metadata.
-Your task is to evaluate the credibility of the content of the given URL.
+system_prompt_web_credibility_batch = f"""You are an expert fact-checker and researcher. You will be given a numbered list of URLs, each with some URL metadata.
+Your task is to evaluate the credibility of the content of each given URL.
 
 **Instructions:**
-**Credibility Score (`credibility_score`)**:  
-    - Base this score (0.0 to 1.0) on:  
-        - Domain reliability (peer-reviewed, official, or trusted news source).  
-        - Author expertise (e.g., known expert vs. anonymous).  
-        - Recency (fresher content gets a higher score unless older info is more authoritative)."""
+**Credibility Scores (`credibility_scores`)**:  
+    - Return exactly one score per URL, in the order of the list.  
+{_CREDIBILITY_CRITERIA}"""
 
-web_credibility_grader_agent = Agent(
+web_credibility_batch_grader_agent = Agent(
     model_4o,
     model_settings={"temperature": 0.0},
-    system_prompt=system_prompt_web_credibility,
-    output_type=WebCredibilityGrader,
+    system_prompt=system_prompt_web_credibility_batch,
+    output_type=WebCredibilityBatchGrader,
 )
 
 
@@ -179,15 +233,10 @@ class CompanyMetric(BaseModel):
     value: Union[int, str, float] = Field(description="The value of the metric")
 
 
-system_prompt_company_metric = """Generate a direct and well-structured answer to the question, using only the provided sources. Put full answer in the comment field.
+system_prompt_company_metric = f"""Generate a direct and well-structured answer to the question, using only the provided sources. Put full answer in the comment field.
 Put the extracted particular value in the value field. For numeric values write them in the full numeric form (120 000 000 but not 120 million).
 
-### Guidelines:
-1. **Synthesize** details if multiple sources agree.
-2. **Prioritize higher credibility scores** if sources conflict.
-3. **Prioritize official sources, such as official websites, annual reports, etc.**
-4. **Cite sources explicitly** using *(According to [Title]( URL ))*.
-5. **Ensure clarity, accuracy, and neutrality.**
+{_GUIDELINES}
 """
 
 company_metric_agent = Agent(
@@ -206,17 +255,11 @@ company_metric_agent_with_websearch = Agent(
 )
 
 
-system_prompt_websearch = """
-## Role
-You are expert in analysis of financial statements and annual reports.
+system_prompt_websearch = f"""
+{_ROLE_FINANCIAL}
 Generate a direct and well-structured answer to the question, using only found in web search results.
 
-### Guidelines:
-1. **Synthesize** details if multiple sources agree.
-2. **Prioritize higher credibility scores** if sources conflict.
-3. **Prioritize official sources, such as official websites, annual reports, etc.**
-4. **Cite sources explicitly** using *(According to [Title]( URL ))*.
-5. **Ensure clarity, accuracy, and neutrality.**
+{_GUIDELINES}
 
 Now generate the answer."""
 
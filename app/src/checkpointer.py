@@ -0,0 +1,38 @@
+import zstandard
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Payloads smaller than this are stored as-is, compression would not pay off
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSION_LEVEL = 3
+_ZSTD_PREFIX = "zstd+"
+
+
+class ZstdSerializer(JsonPlusSerializer):
+    """msgpack serializer whose larger payloads are stored as zstd frames."""
+
+    def __init__(self, level: int = COMPRESSION_LEVEL, **kwargs):
+        super().__init__(**kwargs)
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def dumps_typed(self, obj):
+        type_, data = super().dumps_typed(obj)
+        if type_ == "msgpack" and len(data) >= COMPRESSION_MIN_BYTES:
+            return _ZSTD_PREFIX + type_, self._compressor.compress(data)
+        return type_, data
+
+    def loads_typed(self, data):
+        return super().loads_typed(self._maybe_decompress(data))
+
+    def _maybe_decompress(self, data):
+        # Checkpoints written before compression are passed through unchanged
+        type_, payload = data
+        if type_.startswith(_ZSTD_PREFIX):
+            return type_[len(_ZSTD_PREFIX) :], self._decompressor.decompress(payload)
+        return type_, payload
+
+
+def compressed_memory_saver() -> InMemorySaver:
+    """In-memory checkpointer storing graph states as compressed msgpack."""
+    return InMemorySaver(serde=ZstdSerializer())
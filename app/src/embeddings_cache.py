@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_openai import OpenAIEmbeddings
+
+from .logger_initialization import initialize_logger
+
+logger = initialize_logger("embeddings_cache")
+
+EMBEDDINGS_CACHE_PATH = os.getenv("EMBEDDINGS_CACHE_PATH", "cache/embeddings.sqlite")
+# Vectors kept on disk (~6KB each), the oldest ones are dropped beyond this
+EMBEDDINGS_CACHE_MAX_ROWS = int(os.getenv("EMBEDDINGS_CACHE_MAX_ROWS", "50000"))
+# Keys per SELECT, below SQLite's bound-parameter limit
+_LOOKUP_BATCH = 500
+
+# One connection per cache file for the whole process, with a lock since it is
+# used from the event loop and from worker threads
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _cache_key(model: str, text: str) -> str:
+    return hashlib.blake2b(f"{model}\0{text}".encode(), digest_size=32).hexdigest()
+
+
+class CachedOpenAIEmbeddings(OpenAIEmbeddings):
+    """
+    OpenAIEmbeddings with an on-disk, content-addressed cache of document embeddings.
+
+    Vectors are stored in SQLite keyed by a hash of (model, text), so chunks that were
+    embedded before, in this process or a previous one, skip the API call.
+    """
+
+    cache_path: str = EMBEDDINGS_CACHE_PATH
+
+    def _connect(self):
+        """Shared (connection, lock) of the cache file, opened on first use."""
+        with _connections_lock:
+            if self.cache_path not in _connections:
+                directory = os.path.dirname(self.cache_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                connection = sqlite3.connect(
+                    self.cache_path, timeout=30, check_same_thread=False
+                )
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+                )
+                _connections[self.cache_path] = (connection, threading.Lock())
+            return _connections[self.cache_path]
+
+    def _lookup(self, keys):
+        found = {}
+        connection, lock = self._connect()
+        with lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[start : start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, keys, vectors):
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in zip(keys, vectors)
+        ]
+        connection, lock = self._connect()
+        with lock, connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)", rows
+            )
+            # Rowids grow with each insert, so the lowest ones are the oldest vectors
+            connection.execute(
+                "DELETE FROM embeddings WHERE rowid <= "
+                "(SELECT MAX(rowid) FROM embeddings) - ?",
+                (EMBEDDINGS_CACHE_MAX_ROWS,),
+            )
+
+    def _split_misses(self, texts):
+        keys = [_cache_key(self.model, text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+        # Embed each missing text once, even if it appears several times
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                misses.setdefault(key, text)
+        if texts:
+            logger.info(
+                f"Embeddings cache: {len(texts) - len(misses)}/{len(texts)} hits"
+            )
+        return keys, cached, misses
+
+    def embed_documents(self, texts, chunk_size=None, **kwargs):
+        keys, cached, misses = self._split_misses(texts)
+        if misses:
+            vectors = super().embed_documents(
+                list(misses.values()), chunk_size=chunk_size, **kwargs
+            )
+            self._store(list(misses), vectors)
+            cached.update(zip(misses, vectors))
+        return [cached[key] for key in keys]
+
+    async def aembed_documents(self, texts, chunk_size=None, **kwargs):
+        keys, cached, misses = self._split_misses(texts)
+        if misses:
+            vectors = await super().aembed_documents(
+                list(misses.values()), chunk_size=chunk_size, **kwargs
+            )
+            self._store(list(misses), vectors)
+            cached.update(zip(misses, vectors))
+        return [cached[key] for key in keys]
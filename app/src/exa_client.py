@@ -0,0 +1,78 @@
+import asyncio
+import os
+import re
+import weakref
+
+from dotenv import load_dotenv
+from exa_py import AsyncExa
+
+from .logger_initialization import initialize_logger
+from .retry import NON_RETRYABLE_STATUSES, backoff_delay
+
+load_dotenv()
+
+logger = initialize_logger("exa_client")
+
+# Max concurrent Exa requests per event loop
+EXA_MAX_CONCURRENCY = int(os.getenv("EXA_MAX_CONCURRENCY", "5"))
+# exa_py reports HTTP failures as ValueError("... status code <N>: ...")
+_STATUS_PATTERN = re.compile(r"status code (\d{3})")
+
+# asyncio primitives are bound to the loop that first uses them, so keep one per loop
+_semaphores = weakref.WeakKeyDictionary()
+# AsyncExa pools its HTTP connections on the loop that first uses it
+_clients = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(EXA_MAX_CONCURRENCY)
+    return semaphore
+
+
+def _get_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncExa(api_key=os.getenv("EXA_API_KEY"))
+    return client
+
+
+def _status_code(error):
+    """HTTP status of a failed Exa request, if it can be determined."""
+    # exa_py raises a plain ValueError, without the response or its headers
+    match = _STATUS_PATTERN.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+# Exa API call function with rate limiting and retry logic (async)
+async def rate_limited_search(
+    query, num_results=15, max_retries=10, backoff_factor=1.5
+):
+    for attempt in range(1, max_retries + 1):
+        try:
+            async with _get_semaphore():
+                return await _get_client().search_and_contents(
+                    query,
+                    text=True,
+                    summary=True,
+                    type="auto",
+                    num_results=num_results,
+                )
+
+        except Exception as e:
+            status = _status_code(e)
+            if status in NON_RETRYABLE_STATUSES:
+                logger.info(f"EXA -- HTTP {status}, not retrying. Error: {e}")
+                raise e
+            if attempt >= max_retries:
+                logger.info(f"EXA -- Failed after {max_retries} attempts. Error: {e}")
+                raise e
+
+            backoff_time = backoff_delay(attempt, backoff_factor)
+            logger.info(
+                f"EXA -- Attempt {attempt} failed {e}. Retrying in {backoff_time:.1f} seconds..."
+            )
+            await asyncio.sleep(backoff_time)
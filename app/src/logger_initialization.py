@@ -1,10 +1,20 @@
-import json
+import atexit
 import logging
 import os
+import queue
 import sys
 
-from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+from datetime import date, datetime
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+import orjson
+
+
+@lru_cache(maxsize=1024)
+def _iso(seconds: int) -> str:
+    """ISO timestamp of a whole second, cached since many records share the same second."""
+    return datetime.fromtimestamp(seconds).isoformat()
 
 
 class JSONFormatter(logging.Formatter):
@@ -13,7 +23,7 @@ class JSONFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
         log_data = {
-            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "timestamp": f"{_iso(int(record.created))}.{int(record.msecs):03d}",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -30,7 +40,7 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, "extra_fields"):
             log_data.update(record.extra_fields)
 
-        return json.dumps(log_data, ensure_ascii=False)
+        return orjson.dumps(log_data, default=str).decode()
 
 
 class ReadableFormatter(logging.Formatter):
@@ -67,6 +77,20 @@ def initialize_logger(
         >>> logger = initialize_logger("chatbot")
         >>> logger.info("Application started")
     """
+    return _initialize_logger_cached(
+        log_name, log_level, log_dir, console_output, json_format
+    )
+
+
+@lru_cache(maxsize=None)
+def _initialize_logger_cached(
+    log_name: str,
+    log_level: int,
+    log_dir: str,
+    console_output: bool,
+    json_format: bool,
+) -> logging.Logger:
+    """Configure the logger once per argument set; repeated calls return it as is."""
     # Ensure the log directory exists
     os.makedirs(log_dir, exist_ok=True)
 
@@ -75,12 +99,18 @@ def initialize_logger(
     logger = logging.getLogger(logger_name)
     logger.setLevel(log_level)
 
-    # Remove existing handlers to prevent duplicates
+    # Stop the listener of a previous initialization and remove existing handlers
+    # to prevent duplicates
+    previous_listener = getattr(logger, "queue_listener", None)
+    if previous_listener is not None:
+        previous_listener.stop()
+        for handler in previous_listener.handlers:
+            handler.close()
     if logger.hasHandlers():
         logger.handlers.clear()
 
     # Create log file path with name prefix
-    log_filename = f"{log_name}_{datetime.now().strftime('%Y-%m-%d')}.log"
+    log_filename = f"{log_name}_{date.today().isoformat()}.log"
     log_file = os.path.join(log_dir, log_filename)
 
     # Create file handler with rotation
@@ -96,9 +126,7 @@ def initialize_logger(
     else:
         file_formatter = ReadableFormatter()
     file_handler.setFormatter(file_formatter)
-
-    # Add file handler to logger
-    logger.addHandler(file_handler)
+    handlers = [file_handler]
 
     # Create console handler if requested
     if console_output:
@@ -106,7 +134,16 @@ def initialize_logger(
         console_handler.setLevel(log_level)
         console_formatter = ReadableFormatter()
         console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
+
+    # The logger only enqueues records; file and console writes happen on the
+    # listener's background thread, off the event loop
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.queue_listener = listener
 
     # Prevent propagation to root logger
     logger.propagate = False
@@ -1,73 +1,138 @@
+import hashlib
 import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import aiohttp
-import pdfplumber
+import numpy as np
+import pypdfium2 as pdfium
 from .logger_initialization import initialize_logger
 import asyncio
-from urllib.parse import quote
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
 
 from bs4 import BeautifulSoup
-from exa_py import AsyncExa
 from langchain_core.documents import Document
 from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
 from datetime import datetime
-from io import BytesIO
 from tqdm.asyncio import tqdm
-from .agents import web_credibility_grader_agent
+from .agents import web_credibility_batch_grader_agent
+from .embeddings_cache import CachedOpenAIEmbeddings
+from .exa_client import rate_limited_search
+from .retry import backoff_delay, retry_after_seconds
 
 load_dotenv()
 
 logger = initialize_logger("parsing_utils")
 
-embd = OpenAIEmbeddings(model="text-embedding-3-small")
+embd = CachedOpenAIEmbeddings(model="text-embedding-3-small")
 selected_keys_metadata = ["company", "status", "last_update", "url"]
+# Built once and shared by all calls, with a 10% chunk overlap
+_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=1000, chunk_overlap=100, length_function=len, is_separator_regex=False
+)
+
+# Credibility grading limits: max concurrent LLM calls per event loop and per-batch timeout (seconds)
+CREDIBILITY_MAX_CONCURRENCY = 8
+CREDIBILITY_TIMEOUT = 30
+# Documents graded per LLM call and snippet length sent for each of them
+CREDIBILITY_BATCH_SIZE = 20
+CREDIBILITY_BATCH_SNIPPET_CHARS = 1000
+# A failed batch is graded once more before its documents are scored as not credible
+CREDIBILITY_BATCH_ATTEMPTS = 2
+CREDIBILITY_FALLBACK_SCORE = 0.0
+
+# PDFs above these limits fall back to the search-engine text
+PDF_MAX_BYTES = 5_000_000
+PDF_MAX_PAGES = 50
+# PDFium is not thread-safe, so PDF parsing in the thread pool is serialized
+_pdfium_lock = threading.Lock()
+
+# Dedicated pool for HTML/PDF parsing, kept apart from the loop's default executor
+_PARSE_EXEC = ThreadPoolExecutor(
+    max_workers=min(16, (os.cpu_count() or 1) * 2), thread_name_prefix="parse"
+)
+
+# Fetched HTML is parsed up to this size, enough for article-length content
+HTML_MAX_BYTES = 2_000_000
+READ_CHUNK = 65536
+
+# Per-thread vector stores reused across retries and released when the graph ends;
+# the cap only bounds stores whose release was missed, least recently used first
+MAX_THREAD_STORES = 32
+THREAD_STORES: "OrderedDict[str, tuple[InMemoryVectorStore, threading.Lock]]" = (
+    OrderedDict()
+)
+_thread_stores_lock = threading.Lock()
+
+# Connection pool shared by the page fetches of one Exa search
+FETCH_CONNECTION_LIMIT = 100
+FETCH_CONNECTION_LIMIT_PER_HOST = 10
+FETCH_DNS_CACHE_TTL = 300  # seconds
+# Ask for compressed bodies, aiohttp decodes them (brotli needs the brotli package)
+FETCH_HEADERS = {"Accept-Encoding": "gzip, deflate, br", "User-Agent": "Mozilla/5.0"}
+FETCH_MAX_CONCURRENCY = 20
+FETCH_MAX_BYTES = 50_000_000
+# Exa texts longer than this are used as they are, without fetching the page
+EXA_TEXT_COMPLETE_CHARS = 4000
+FETCH_TIMEOUT = aiohttp.ClientTimeout(sock_connect=2, sock_read=8, total=15)
+SCRAPINGANT_TIMEOUT = aiohttp.ClientTimeout(total=60)
+SCRAPINGANT_MAX_RETRIES = 3
+SCRAPINGANT_BACKOFF_FACTOR = 1.5
+# Throttling and temporary unavailability are worth another attempt
+SCRAPINGANT_RETRY_STATUSES = frozenset({429, 503})
+# asyncio primitives are bound to the loop that first uses them, so keep one per loop
+_fetch_semaphores = weakref.WeakKeyDictionary()
+_credibility_semaphores = weakref.WeakKeyDictionary()
+# Normalized embedding matrices of the vector stores searched so far
+_store_matrices = weakref.WeakKeyDictionary()
+
+
+def _get_fetch_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _fetch_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _fetch_semaphores[loop] = asyncio.Semaphore(FETCH_MAX_CONCURRENCY)
+    return semaphore
+
+
+def _get_credibility_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _credibility_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _credibility_semaphores[loop] = asyncio.Semaphore(
+            CREDIBILITY_MAX_CONCURRENCY
+        )
+    return semaphore
 
 
-# Exa API call function with retry logic (async)
-async def exacall(query, num_results=15, max_retries=10, backoff_factor=1.5):
-    retry_count = 0  # Counter for the number of retries
+# Common class names of the main content container, matched against each class
+_MAIN_CONTENT_CLASS = re.compile(
+    r"^(content|main-content|article-content|post-content|entry-content)$"
+)
 
-    while retry_count < max_retries:
-        try:
-            # Once rate limit is available, make the API call
-            exa = AsyncExa(api_key=os.getenv("EXA_API_KEY"))
-
-            results = await exa.search_and_contents(
-                query,
-                text=True,
-                summary=True,
-                type="auto",
-                num_results=num_results,
-            )
-            return results  # Return the results if the call is successful
 
-        except Exception as e:
-            # If there's an error (e.g., network issues or API errors), handle retry logic
-            retry_count += 1
-            if retry_count < max_retries:
-                # Exponential backoff strategy
-                backoff_time = backoff_factor**retry_count
-                logger.info(
-                    f"EXA -- Attempt {retry_count} failed {e}. Retrying in {backoff_time} seconds..."
-                )
-                await asyncio.sleep(backoff_time)  # Wait before retrying (async sleep)
-            else:
-                # If retries are exhausted, raise the exception
-                logger.info(f"EXA -- Failed after {max_retries} attempts. Error: {e}")
-                raise e
-    return None  # Return None if max retries are reached without success
+async def _read_limited(response, limit):
+    """Read at most limit bytes of a response body; the flag tells if it was cut."""
+    buffer = bytearray()
+    async for chunk in response.content.iter_chunked(READ_CHUNK):
+        buffer.extend(chunk)
+        if len(buffer) > limit:
+            return bytes(buffer[:limit]), True
+    return bytes(buffer), False
 
 
 # HTML parsing functions (async - runs CPU-bound work in thread pool)
 async def parse_url_soup_html(html):
-    """Parse HTML asynchronously by running CPU-bound BeautifulSoup work in a thread pool."""
+    """Parse HTML (str or raw bytes) asynchronously by running CPU-bound BeautifulSoup work in a thread pool."""
 
     def _parse_sync(html_content):
         try:
-            soup = BeautifulSoup(html_content, "html.parser")
+            soup = BeautifulSoup(html_content, "lxml")
 
             # Remove unwanted elements
             for element in soup.find_all(
@@ -78,13 +143,7 @@ async def parse_url_soup_html(html):
             # Try to find main content container - common class/id names
             main_content = soup.find(
                 ["main", "article", "div"],
-                class_=[
-                    "content",
-                    "main-content",
-                    "article-content",
-                    "post-content",
-                    "entry-content",
-                ],
+                class_=_MAIN_CONTENT_CLASS,
             )
 
             if main_content:
@@ -102,10 +161,10 @@ async def parse_url_soup_html(html):
 
     # Run CPU-bound parsing in thread pool to avoid blocking event loop
     loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _parse_sync, html)
+    return await loop.run_in_executor(_PARSE_EXEC, _parse_sync, html)
 
 
-async def parse_url_text_scrapingant(url):
+async def parse_url_text_scrapingant(url, session):
     """Scrape a URL using ScrapingAnt API (async with aiohttp)"""
     api_key = os.getenv("SCRAPER_ANT_API_KEY")
 
@@ -116,14 +175,28 @@ async def parse_url_text_scrapingant(url):
     request_url = f"https://api.scrapingant.com/v2/general?url={encoded_url}&x-api-key={api_key}&return_page_source=true"
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(request_url) as response:
+        for attempt in range(1, SCRAPINGANT_MAX_RETRIES + 1):
+            async with session.get(
+                request_url, timeout=SCRAPINGANT_TIMEOUT
+            ) as response:
                 if response.status == 200:
-                    data = await response.text()
+                    data, _ = await _read_limited(response, HTML_MAX_BYTES)
                     return await parse_url_soup_html(data)
-                else:
+                if (
+                    response.status not in SCRAPINGANT_RETRY_STATUSES
+                    or attempt == SCRAPINGANT_MAX_RETRIES
+                ):
                     logger.info(f"scrapingant -- HTTP {response.status} for URL {url}")
                     return None
+                backoff_time = backoff_delay(
+                    attempt,
+                    SCRAPINGANT_BACKOFF_FACTOR,
+                    retry_after_seconds(response.headers),
+                )
+            logger.info(
+                f"scrapingant -- HTTP {response.status}, retrying in {backoff_time:.1f} seconds -- {url}"
+            )
+            await asyncio.sleep(backoff_time)
     except Exception as e:
         logger.info(f"scrapingant -- Error scraping URL {url}: {e}")
         return None
@@ -138,47 +211,65 @@ def is_pdf(response):
 
 def extract_text_from_pdf_url(response):
     if response.status_code == 200:
-        with pdfplumber.open(BytesIO(response.content)) as pdf:
-            if len(pdf.pages) > 50:
-                return None
-            text = "\n".join(
-                page.extract_text() for page in pdf.pages if page.extract_text()
-            )
-            return text
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(response.content)
+            try:
+                if len(pdf) > PDF_MAX_PAGES:
+                    return None
+                pages_text = []
+                for page in pdf:
+                    textpage = page.get_textpage()
+                    pages_text.append(textpage.get_text_range())
+                    textpage.close()
+                    page.close()
+            finally:
+                pdf.close()
+        return "\n".join(text for text in pages_text if text)
     else:
         return None  # Not a PDF or error in request
 
 
 # Main function to get full text from URL (async)
-async def get_full_text_url(document):
+async def get_full_text_url(document, session):
     url = document.url
+    # Exa already returned article-length text, fetching the page adds little
+    if len(document.text or "") > EXA_TEXT_COMPLETE_CHARS:
+        logger.info(f"Using Exa text, skipping fetch -- {url}")
+        return " ".join(document.text.split())
+
     logger.info(f"Getting full text url {url}")
 
-    timeout = aiohttp.ClientTimeout(total=1)
+    # Bound concurrent fetches so a large result set cannot exhaust the connector
+    async with _get_fetch_semaphore():
+        text = None
+        try:
+            logger.info(f"Request -- {url}")
+            async with session.get(
+                url, allow_redirects=False, timeout=FETCH_TIMEOUT
+            ) as response:
+                content_type = response.headers.get("Content-Type", "")
+                content_length = response.content_length or 0
 
-    try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            # Check content length with HEAD request
-            async with session.head(url, allow_redirects=True) as head_response:
-                content_length = head_response.headers.get("Content-Length")
-                if content_length and int(content_length) > 50_000_000:  # 50 MB limit
+                # Size is checked on the GET headers, before any of the body is read
+                if content_length > FETCH_MAX_BYTES:
                     logger.info(f"File too large, skipping parsing. -- {url}")
                     return document.text.replace("\n", " ")
-    except Exception as e:
-        logger.info(f"Head request error: {e} -- {url}")
-
-    text = None
-    try:
-        logger.info(f"Request -- {url}")
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url, allow_redirects=False) as response:
-                content_type = response.headers.get("Content-Type", "")
 
                 if ("application/pdf" in content_type) and (response.status == 200):
+                    if content_length > PDF_MAX_BYTES:
+                        logger.info(f"PDF too large, skipping parsing. -- {url}")
+                        return document.text.replace("\n", " ")
                     logger.info(f"Getting full text --pdf url -- {url}")
                     # For PDF, we need to read the content and use the sync extract function
                     # Run CPU-bound PDF extraction in thread pool
-                    pdf_content = await response.read()
+                    # Stream the body and give up as soon as it exceeds the size cap,
+                    # Content-Length may be missing or wrong
+                    pdf_content, truncated = await _read_limited(
+                        response, PDF_MAX_BYTES
+                    )
+                    if truncated:
+                        logger.info(f"PDF too large, skipping parsing. -- {url}")
+                        return document.text.replace("\n", " ")
                     loop = asyncio.get_event_loop()
 
                     # Create a mock response object for extract_text_from_pdf_url
@@ -192,18 +283,19 @@ async def get_full_text_url(document):
                         pdf_content, 200, {"Content-Type": content_type}
                     )
                     text = await loop.run_in_executor(
-                        None, extract_text_from_pdf_url, mock_response
+                        _PARSE_EXEC, extract_text_from_pdf_url, mock_response
                     )
                 elif url.endswith(".html") or url.endswith(".htm"):
                     logger.info(f"Getting full text --html url -- {url}")
-                    html_content = await response.text()
+                    # Raw bytes, lxml detects the encoding itself
+                    html_content, _ = await _read_limited(response, HTML_MAX_BYTES)
                     text = await parse_url_soup_html(html_content)
                 else:
                     logger.info(f"Getting full text -- using scraperAPI -- {url}")
-                    text = await parse_url_text_scrapingant(url)
-    except Exception as e:
-        logger.info(f"request error {e}, go to SearchEngine text -- {url}")
-        text = None
+                    text = await parse_url_text_scrapingant(url, session)
+        except Exception as e:
+            logger.info(f"request error {e}, go to SearchEngine text -- {url}")
+            text = None
 
     if text is None:
         text = document.text.replace("\n", " ")
@@ -214,18 +306,20 @@ async def get_full_text_url(document):
         return text
 
 
-# Simple async function for web credibility grading
-async def grade_web_credibility(
-    question: str, date: str, author: str, snippet: str, url: str
-) -> float:
-    """Grade the credibility of a web document."""
+async def grade_web_credibility_batch(question: str, items: list[dict]) -> list[float]:
+    """Grade the credibility of several web documents with a single LLM call."""
+    listing = "\n\n".join(f"""[{i}] URL: {item["url"]}
+Publication Date: '{item["date"]}'
+Author: '{item["author"]}'
+Snippet: '{item["snippet"]}'""" for i, item in enumerate(items, start=1))
     prompt = f"""Query: '{question}'
-Publication Date: '{date}'
-Author: '{author}'
-Snippet: '{snippet}'
-URL: {url}"""
-    result = await web_credibility_grader_agent.run(prompt)
-    return result.output.credibility_score
+
+{listing}"""
+    result = await web_credibility_batch_grader_agent.run(prompt)
+    scores = result.output.credibility_scores
+    if len(scores) != len(items):
+        raise ValueError(f"Expected {len(items)} credibility scores, got {len(scores)}")
+    return scores
 
 
 # Async function to add credibility scores to web search documents
@@ -233,41 +327,97 @@ async def add_credibility_web_search(documents, question):
     """Determines whether the web results are credible."""
     logger.info("---ADD CREDIBILITY TO DOCUMENTS---")
 
-    # Score each doc in parallel
-    tasks = []
+    async def _grade_limited(items):
+        # Grader calls of all concurrent searches share one limit, to respect rate limits
+        async with _get_credibility_semaphore():
+            for attempt in range(1, CREDIBILITY_BATCH_ATTEMPTS + 1):
+                try:
+                    # A single slow batch should not stall the whole search
+                    return await asyncio.wait_for(
+                        grade_web_credibility_batch(question, items),
+                        timeout=CREDIBILITY_TIMEOUT,
+                    )
+                except Exception as e:
+                    if attempt == CREDIBILITY_BATCH_ATTEMPTS:
+                        raise
+                    logger.info(f"Credibility batch failed: {e!r}, retrying")
+
+    items = []
     doc_indices = []
 
     for i, d in enumerate(documents):
-        if d.metadata.get("url") is not None:
-            logger.info(
-                f"Adding credibility to web document -- {d.metadata.get('url')}"
-            )
-            tasks.append(
-                grade_web_credibility(
-                    question=question,
-                    url=d.metadata.get("url", ""),
-                    date=d.metadata.get("date", ""),
-                    author=d.metadata.get("author", ""),
-                    snippet=d.page_content[:5000],
-                )
+        metadata = d.metadata
+        url = metadata.get("url")
+        if url is None:
+            continue
+        logger.info(f"Adding credibility to web document -- {url}")
+        items.append(
+            {
+                "url": url,
+                "date": metadata.get("date", ""),
+                "author": metadata.get("author", ""),
+                "snippet": d.page_content[:CREDIBILITY_BATCH_SNIPPET_CHARS],
+            }
+        )
+        doc_indices.append(i)
+
+    # Run all credibility batches in parallel
+    if items:
+        batches = [
+            (
+                doc_indices[start : start + CREDIBILITY_BATCH_SIZE],
+                items[start : start + CREDIBILITY_BATCH_SIZE],
             )
-            doc_indices.append(i)
-
-    # Run all credibility checks in parallel
-    if tasks:
-        credibility_scores = await asyncio.gather(*tasks, return_exceptions=True)
+            for start in range(0, len(items), CREDIBILITY_BATCH_SIZE)
+        ]
+        batch_scores = await asyncio.gather(
+            *(_grade_limited(batch_items) for _, batch_items in batches),
+            return_exceptions=True,
+        )
 
         # Update documents with credibility scores
-        for idx, score in zip(doc_indices, credibility_scores):
-            if isinstance(score, Exception):
-                logger.info(f"Error grading credibility for document {idx}: {score}")
-                documents[idx].metadata["credibility"] = 0.0
-            else:
+        for (indices, _), scores in zip(batches, batch_scores):
+            if isinstance(scores, Exception):
+                # Ungraded sources must not pass the credibility filter
+                urls = [documents[idx].metadata.get("url") for idx in indices]
+                logger.info(
+                    f"Error grading credibility for documents {indices}: {scores!r}, "
+                    f"using {CREDIBILITY_FALLBACK_SCORE} for {urls}"
+                )
+                scores = [CREDIBILITY_FALLBACK_SCORE] * len(indices)
+            for idx, score in zip(indices, scores):
                 documents[idx].metadata["credibility"] = score
 
     return documents
 
 
+def _is_tracking_param(name):
+    return name.lower().startswith("utm_") or name.lower() == "fbclid"
+
+
+def _canon(url):
+    """Canonical form of a URL, used to detect duplicate search results."""
+    if not url:
+        return url
+    parts = urlsplit(url)
+    query = urlencode(
+        [
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not _is_tracking_param(name)
+        ]
+    )
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip("/"),
+            query,
+            "",
+        )
+    )
+
+
 # Main Exa search function
 async def exa_search_results(
     query: str,
@@ -276,20 +426,38 @@ async def exa_search_results(
 ) -> list[Document]:
     logger.info(f"Start exa search with query: {query}")
 
-    results = await exacall(query, num_results)
+    results = await rate_limited_search(query, num_results)
     logger.info(f"Exa search completed with {len(results.results)} results")
 
-    # For in-memory store, we don't track existing docs across sessions
-    # All results will be processed
-    existing_docs = []
-    new_docs = [doc for doc in results.results if doc.url not in existing_docs]
-
-    logger.info(f"Found {len(new_docs)} new documents: {[d.url for d in new_docs]}")
+    # Exa may return the same page under several URL variants, keep the first one;
+    # results without a fetchable URL are dropped
+    seen = set()
+    new_docs = []
+    for doc in results.results:
+        if not doc.url or not doc.url.startswith(("http://", "https://")):
+            continue
+        canonical_url = _canon(doc.url)
+        if canonical_url not in seen:
+            seen.add(canonical_url)
+            new_docs.append(doc)
+
+    logger.info("Found %d new documents: %s", len(new_docs), [d.url for d in new_docs])
     logger.info(f"Async websearch started with {len(new_docs)} tasks")
 
-    # Use asyncio.gather to parallelize async tasks
-    tasks_list = [get_full_text_url(doc) for doc in new_docs]
-    texts = await asyncio.gather(*tasks_list, return_exceptions=True)
+    # One pooled session for all fetches, so connections and DNS lookups are reused
+    async with aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=10),
+        connector=aiohttp.TCPConnector(
+            limit=FETCH_CONNECTION_LIMIT,
+            limit_per_host=FETCH_CONNECTION_LIMIT_PER_HOST,
+            ttl_dns_cache=FETCH_DNS_CACHE_TTL,
+        ),
+        cookie_jar=aiohttp.DummyCookieJar(),
+        headers=FETCH_HEADERS,
+    ) as session:
+        # Use asyncio.gather to parallelize async tasks
+        tasks_list = [get_full_text_url(doc, session) for doc in new_docs]
+        texts = await asyncio.gather(*tasks_list, return_exceptions=True)
 
     # Update documents with retrieved text
     for i, text in enumerate(tqdm(texts, desc="Processing documents")):
@@ -326,29 +494,176 @@ def clean_metadata_from_docs(doc):
     return doc
 
 
-def create_retriever_in_memory(docs):
-    docs = [clean_metadata_from_docs(doc) for doc in docs]
+def _chunk_id(url, chunk_idx):
+    # The separator keeps ("...?id=1", 12) and ("...?id=11", 2) apart
+    return hashlib.sha1(f"{url}\0{chunk_idx}".encode()).hexdigest()
 
-    vector_store_inmemory = InMemoryVectorStore.from_documents(docs, embedding=embd)
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50)
-    docs = text_splitter.split_documents(docs)
+def _get_thread_store(thread_id):
+    """Return the (vector store, lock) pair for a thread, creating it if needed."""
+    with _thread_stores_lock:
+        if thread_id in THREAD_STORES:
+            THREAD_STORES.move_to_end(thread_id)
+        else:
+            THREAD_STORES[thread_id] = (
+                InMemoryVectorStore(embedding=embd),
+                threading.Lock(),
+            )
+            if len(THREAD_STORES) > MAX_THREAD_STORES:
+                THREAD_STORES.popitem(last=False)
+        return THREAD_STORES[thread_id]
 
-    if len(docs) > 0:
-        logger.info("Adding documents to the inmemory vectorstore")
-        vector_store_inmemory.add_documents(documents=docs)
-        logger.info("Documents added to the inmemory vectorstore")
 
+def release_thread_store(thread_id):
+    """Drop the vector store of a finished graph run, so its chunks are freed."""
+    with _thread_stores_lock:
+        THREAD_STORES.pop(thread_id, None)
+
+
+def _add_new_documents(vector_store, docs, ids):
+    """Embed and add only the documents whose id is not in the store yet."""
+    new_docs, new_ids, seen = [], [], set()
+    for doc, doc_id in zip(docs, ids):
+        if doc_id not in vector_store.store and doc_id not in seen:
+            seen.add(doc_id)
+            new_docs.append(doc)
+            new_ids.append(doc_id)
+
+    if new_docs:
+        vector_store.add_documents(documents=new_docs, ids=new_ids)
+    return len(new_docs)
+
+
+def create_retriever_in_memory(docs, thread_id=None):
+    """
+    Build the in-memory vectorstore for web documents.
+
+    When thread_id is given, the store is shared by all calls of that thread and
+    only chunks that were not ingested before are embedded.
+    """
+    docs = [clean_metadata_from_docs(doc) for doc in docs]
+
+    if thread_id is None:
+        vector_store_inmemory, lock = (
+            InMemoryVectorStore(embedding=embd),
+            threading.Lock(),
+        )
     else:
+        vector_store_inmemory, lock = _get_thread_store(thread_id)
+
+    split_docs = _SPLITTER.split_documents(docs)
+
+    # Chunk ids are derived from the URL and the chunk position within the document
+    chunk_counts = {}
+    split_ids = []
+    for doc in split_docs:
+        url = doc.metadata.get("url")
+        chunk_idx = chunk_counts.get(url, 0)
+        chunk_counts[url] = chunk_idx + 1
+        split_ids.append(_chunk_id(url, chunk_idx))
+
+    if len(split_docs) == 0:
         return None
 
+    # All new chunks are embedded in a single batched embed_documents call
+    with lock:
+        logger.info("Adding documents to the inmemory vectorstore")
+        added = _add_new_documents(vector_store_inmemory, split_docs, split_ids)
+        logger.info(f"{added} new documents added to the inmemory vectorstore")
+
     return vector_store_inmemory
 
 
+def apply_credibility(vector_store, documents):
+    """Copy the credibility scores of graded documents onto their stored chunks."""
+    scores = {
+        doc.metadata.get("url"): doc.metadata["credibility"]
+        for doc in documents
+        if "credibility" in doc.metadata
+    }
+    for entry in vector_store.store.values():
+        url = entry["metadata"].get("url")
+        if url in scores:
+            entry["metadata"]["credibility"] = scores[url]
+
+
+async def index_with_credibility(documents, question, thread_id=None):
+    """
+    Grade the credibility of web documents while they are being embedded.
+
+    Returns the graded documents and the vector store (None if nothing was indexed).
+    Chunks are indexed from metadata copies, since grading updates the documents
+    in place; apply_credibility attaches the scores to the chunks afterwards.
+    """
+    to_index = [
+        Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+        for doc in documents
+    ]
+    return await asyncio.gather(
+        add_credibility_web_search(documents, question),
+        asyncio.to_thread(create_retriever_in_memory, to_index, thread_id),
+    )
+
+
+def _store_matrix(vectorstore):
+    """
+    Entries of a vector store and their L2-normalized float32 embedding matrix.
+
+    The matrix is kept per store and only extended with the chunks added since the
+    last search, so lists of floats are not converted again on every query.
+    """
+    store = vectorstore.store
+    cached = _store_matrices.get(vectorstore)
+    # Stores only grow, new entries are appended in insertion order
+    if cached is None or len(cached[0]) > len(store):
+        cached = ([], None)
+    entries, matrix = cached
+    if len(entries) < len(store):
+        new_entries = list(store.values())[len(entries) :]
+        vectors = np.asarray([entry["vector"] for entry in new_entries], np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        entries = entries + new_entries
+        matrix = vectors if matrix is None else np.vstack([matrix, vectors])
+        _store_matrices[vectorstore] = (entries, matrix)
+    return entries, matrix
+
+
+def cosine_search(vectorstore, query, k=30):
+    """
+    Exact cosine similarity search over an InMemoryVectorStore.
+
+    Returns (document, similarity) pairs like similarity_search_with_score.
+    """
+    entries, matrix = _store_matrix(vectorstore)
+    if not entries:
+        return []
+
+    query_vector = np.asarray(
+        vectorstore.embedding.embed_query(query), dtype=np.float32
+    )
+    query_norm = np.linalg.norm(query_vector)
+    similarities = (matrix @ query_vector) / (query_norm or 1)
+
+    # Select the top k in linear time, then order only those
+    k = min(k, len(entries))
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top], kind="stable")]
+
+    results = []
+    for i in top:
+        entry = entries[i]
+        doc = Document(
+            id=entry["id"], page_content=entry["text"], metadata=entry["metadata"]
+        )
+        results.append((doc, float(similarities[i])))
+    return results
+
+
 def retrieve_with_credibility(
     vectorstore, query, k_init=30, k_final=15, min_credibility=0.5, alpha=0.5
 ):
-    docs_with_scores = vectorstore.similarity_search_with_score(query, k=k_init)
+    docs_with_scores = cosine_search(vectorstore, query, k=k_init)
 
     # Step 2: Filter documents by minimum credibility
     for doc, score in docs_with_scores:
@@ -363,12 +678,25 @@ def retrieve_with_credibility(
         if doc.metadata.get("credibility", 0) >= min_credibility
     ]
 
+    if not filtered_docs:
+        return []
+
     # Step 3: Compute hybrid score (weighted sum of similarity & credibility)
-    ranked_docs = sorted(
-        filtered_docs,
-        key=lambda d: (1 - alpha) * (d[0].metadata.get("credibility", 0) / 5)
-        + (alpha * (1 - d[1])),
-        reverse=True,
-    )[: min(k_final, len(filtered_docs))]
-
-    return [doc for doc, _ in ranked_docs]
+    credibility = np.fromiter(
+        (doc.metadata.get("credibility", 0) for doc, _ in filtered_docs),
+        dtype=np.float32,
+        count=len(filtered_docs),
+    )
+    similarity = np.fromiter(
+        (1 - score for _, score in filtered_docs),
+        dtype=np.float32,
+        count=len(filtered_docs),
+    )
+    hybrid = (1 - alpha) * (credibility / 5) + alpha * similarity
+
+    # Select the top k_final in linear time, then order only those
+    k = min(k_final, len(filtered_docs))
+    top = np.argpartition(-hybrid, k - 1)[:k]
+    top = top[np.argsort(-hybrid[top], kind="stable")]
+
+    return [filtered_docs[i][0] for i in top]
@@ -0,0 +1,55 @@
+from functools import lru_cache
+
+import tiktoken
+
+from .logger_initialization import initialize_logger
+
+logger = initialize_logger("prompt_budget")
+
+PROMPT_TOKEN_BUDGET = 4000
+# Rough characters per token, used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """Tokenizer of the model, or None if its BPE file cannot be loaded."""
+    # The BPE file is downloaded on first use unless it is in TIKTOKEN_CACHE_DIR
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.info(f"Tokenizer unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-5") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def fit_to_budget(docs: list, max_tokens: int = PROMPT_TOKEN_BUDGET) -> list:
+    """
+    Keep documents, in their ranked order, until the prompt token budget is reached.
+
+    Documents are counted as they are rendered into the prompt. The first document
+    is always kept so the answer agent never receives an empty context.
+    """
+    kept = []
+    used_tokens = 0
+    for doc in docs:
+        tokens = count_tokens(str(doc))
+        if kept and used_tokens + tokens > max_tokens:
+            break
+        kept.append(doc)
+        used_tokens += tokens
+
+    if len(kept) < len(docs):
+        logger.info(
+            f"Prompt budget: kept {len(kept)}/{len(docs)} documents ({used_tokens} tokens)"
+        )
+    return kept
@@ -0,0 +1,44 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Longest exponential backoff step, seconds
+BACKOFF_CAP = 30
+# Client errors that will not succeed on retry
+NON_RETRYABLE_STATUSES = frozenset({400, 401, 403})
+
+
+def retry_after_seconds(headers):
+    """Delay requested by a Retry-After header, in seconds, if present and valid."""
+    if not headers:
+        return None
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # Retry-After may also be an HTTP date
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt, backoff_factor, server_delay=None):
+    """
+    Seconds to wait before the next attempt.
+
+    The server-requested delay is honoured when known, otherwise the capped exponential
+    step is used; up to the same amount of random jitter is added so clients that
+    failed together do not retry together.
+    """
+    if server_delay is not None:
+        base = server_delay
+    else:
+        base = min(BACKOFF_CAP, backoff_factor**attempt)
+    return base + random.uniform(0, base)
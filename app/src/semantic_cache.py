@@ -0,0 +1,120 @@
+import hashlib
+import time
+
+import numpy as np
+from cachetools import TTLCache
+
+from .logger_initialization import initialize_logger
+from .parsing_utils import embd
+
+logger = initialize_logger("semantic_cache")
+
+SEMANTIC_CACHE_TTL = 3600  # seconds
+SEMANTIC_CACHE_THRESHOLD = 0.95  # cosine similarity required for a hit
+SEMANTIC_CACHE_MAX_ENTRIES = 1024
+EXACT_CACHE_MAX_ENTRIES = 5000
+
+
+class SemanticCache:
+    """In-memory similarity cache: near-duplicate keys share one cached payload."""
+
+    def __init__(self, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.vectors = None  # (n, dim) matrix of L2-normalized key embeddings
+        self.entries = []  # parallel list of (namespace, key_text, payload, expiry)
+
+    def _purge_expired(self, now):
+        keep = [i for i, (*_, expiry) in enumerate(self.entries) if expiry > now]
+        if len(keep) == len(self.entries):
+            return
+        self.entries = [self.entries[i] for i in keep]
+        self.vectors = self.vectors[keep] if keep else None
+
+    def lookup(self, vector, threshold, now, namespace=""):
+        if self.vectors is None:
+            return None
+        # Only entries of the same namespace are candidates
+        in_namespace = np.fromiter(
+            (entry[0] == namespace for entry in self.entries),
+            dtype=bool,
+            count=len(self.entries),
+        )
+        if not in_namespace.any():
+            return None
+        similarities = np.where(in_namespace, self.vectors @ vector, -np.inf)
+        best = int(np.argmax(similarities))
+        _, key_text, payload, expiry = self.entries[best]
+        if similarities[best] >= threshold and expiry > now:
+            logger.info(f"Semantic cache hit ({similarities[best]:.3f}) -- {key_text}")
+            return payload
+        return None
+
+    def insert(self, vector, key_text, payload, expiry, now, namespace=""):
+        self._purge_expired(now)
+        if len(self.entries) >= self.max_entries:
+            # Drop the oldest entry
+            self.entries.pop(0)
+            self.vectors = self.vectors[1:]
+        self.entries.append((namespace, key_text, payload, expiry))
+        row = vector[np.newaxis, :]
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+
+
+_cache = SemanticCache()
+# Exact-match layer keyed by query_key, checked before paying for an embedding call
+_exact_cache = TTLCache(maxsize=EXACT_CACHE_MAX_ENTRIES, ttl=SEMANTIC_CACHE_TTL)
+
+
+def query_key(text: str) -> str:
+    """Deterministic idempotency key of a normalized query."""
+    normalized = " ".join(text.strip().lower().split())
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+async def cached_or_call(
+    key_text: str,
+    fn,
+    ttl: int = SEMANTIC_CACHE_TTL,
+    threshold: float | None = SEMANTIC_CACHE_THRESHOLD,
+    namespace: str = "",
+):
+    """
+    Return the cached payload for a semantically similar key, otherwise await fn() and cache it.
+
+    Keys only match within the same namespace, which must hold whatever the
+    similarity threshold cannot tell apart (e.g. the company and metric of a
+    templated question). With threshold=None only exact key matches are served,
+    for free-form questions where no namespace can hold those details.
+    """
+    namespace = " ".join(namespace.strip().lower().split())
+    key = query_key(f"{namespace}\0{key_text}")
+    now = time.monotonic()
+
+    cached = _exact_cache.get(key)
+    if cached is not None and cached[1] > now:
+        logger.info(f"Exact cache hit -- {key_text}")
+        return cached[0]
+
+    if threshold is None:
+        payload = await fn()
+        if payload:
+            _exact_cache[key] = (payload, now + ttl)
+        return payload
+
+    vector = _normalize(await embd.aembed_query(key_text))
+
+    payload = _cache.lookup(vector, threshold, now, namespace)
+    if payload is not None:
+        return payload
+
+    payload = await fn()
+    if payload:
+        _cache.insert(vector, key_text, payload, now + ttl, now, namespace)
+        _exact_cache[key] = (payload, now + ttl)
+    return payload
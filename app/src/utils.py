@@ -1,10 +1,23 @@
+import asyncio
+import io
+import math
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
 from tqdm.asyncio import tqdm
 from src.logger_initialization import initialize_logger
+import numpy as np
 import pandas as pd
-import io
+import xlsxwriter
+from pandas.api.types import is_scalar
 
 logger = initialize_logger("utils")
 
+# Max (company, metric) graphs running at once
+GRAPH_MAX_CONCURRENCY = int(os.getenv("GRAPH_MAX_CONCURRENCY", "16"))
+
 
 async def process_item_async(item, one_metrics_graph, config):
     """Async function to process each (company, metric) pair using one_comp_metric_graph.ainvoke."""
@@ -26,14 +39,24 @@ async def process_item_async(item, one_metrics_graph, config):
             "generation": {"error": str(e)},
             "metrics": metric,
         }
+    finally:
+        # Imported here to keep this module light, the graph has already loaded it
+        from src.parsing_utils import release_thread_store
+
+        # Thread ids repeat across runs, a stale store would mix in old chunks
+        release_thread_store(config["configurable"]["thread_id"])
 
 
 async def process_combinations_async(combinations_list, one_metrics_graph, configs):
     """Process all combinations asynchronously."""
-    tasks = [
-        process_item_async(item, one_metrics_graph, config)
-        for item, config in zip(combinations_list, configs)
-    ]
+    # Large tables would otherwise start every graph at once and hit LLM rate limits
+    semaphore = asyncio.Semaphore(GRAPH_MAX_CONCURRENCY)
+
+    async def bounded(item, config):
+        async with semaphore:
+            return await process_item_async(item, one_metrics_graph, config)
+
+    tasks = [bounded(item, config) for item, config in zip(combinations_list, configs)]
 
     results = []
     for coro in tqdm.as_completed(tasks, desc="Processing documents"):
@@ -60,8 +83,9 @@ async def process_lists(companies_list, metrics_list, one_metrics_graph):
 
 
 def create_table(data):
-    company_names = set()
-    parameters = set()
+    # Companies and parameters in order of first appearance
+    company_names = {}
+    parameters = {}
 
     # Extract unique company names and parameters with exception handling
     for item in data:
@@ -71,8 +95,8 @@ def create_table(data):
 
             # Add to the sets if both company_name and parameter exist
             if company_name and parameter:
-                company_names.add(company_name)
-                parameters.add(parameter)
+                company_names[company_name] = None
+                parameters[parameter] = None
         except KeyError as e:
             # Log the error or just skip this item if there is a missing key
             logger.error(f"Skipping item due to missing key: {e}")
@@ -82,19 +106,10 @@ def create_table(data):
             logger.error(f"Skipping item due to error: {e}")
             continue
 
-    # Convert sets to lists
-    company_names = list(company_names)
-    parameters = list(parameters)
-
-    # Initialize the DataFrame with company names as the first column
-    df = pd.DataFrame(company_names, columns=["company_name"])
-
-    # Add columns for each parameter's value and comment
-    for parameter in parameters:
-        df[parameter + " value"] = None
-        df[parameter + " comment"] = None
+    # One row dict per company, filled in a single pass over the data
+    rows = {company_name: {} for company_name in company_names}
 
-    # Populate the DataFrame with values and comments
+    # Populate the rows with values and comments
     for item in data:
         try:
             # Extract necessary information from new format
@@ -108,9 +123,8 @@ def create_table(data):
             if not company_name or not parameter or value is None or comment is None:
                 continue  # Skip this observation
 
-            # Update the DataFrame
-            df.loc[df["company_name"] == company_name, parameter + " value"] = value
-            df.loc[df["company_name"] == company_name, parameter + " comment"] = comment
+            rows[company_name][parameter + " value"] = value
+            rows[company_name][parameter + " comment"] = comment
 
         except KeyError as e:
             # Log the error or just skip this item if there is a missing key
@@ -121,25 +135,199 @@ def create_table(data):
             logger.error(f"Skipping observation due to error: {e}")
             continue
 
+    # Company names first, then a value and a comment column for each parameter
+    columns = [
+        column
+        for parameter in parameters
+        for column in (parameter + " value", parameter + " comment")
+    ]
+    df = pd.DataFrame(
+        [
+            [company_name] + [row.get(column) for column in columns]
+            for company_name, row in rows.items()
+        ],
+        columns=["company_name"] + columns,
+        dtype=object,
+    )
+
     return df
 
 
 def create_documents_dict(documents):
-    documents_dict = {}
-    for doc in documents:
-        key = doc.metadata.get("url")
-        documents_dict[key] = {
+    # Later documents with the same URL overwrite earlier ones, as before
+    return {
+        doc.metadata.get("url"): {
             "company": doc.metadata.get("company", "Unknown"),
             "title": doc.metadata.get("title", "Unknown"),
             "date": doc.metadata.get("date", "Unknown"),
         }
+        for doc in documents
+    }
+
+
+# Items separated by "++", a single "+" stays part of the item
+_ITEM = re.compile(r"(?:^|\+\+)((?:(?!\+\+).)*)", re.DOTALL)
+
+
+def split_items(text):
+    """Split '++'-separated user input into stripped, non-empty items."""
+    return [item for item in (m.group(1).strip() for m in _ITEM.finditer(text)) if item]
+
+
+# Minimal xlsx package parts, the worksheet itself is streamed row by row
+_XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+_XLSX_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+_XLSX_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+_XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+# Style 0 is the default, style 1 the bold header
+_XLSX_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = "</sheetData></worksheet>"
+ROW_TMPL = '<row r="{r}">{cells}</row>'
+NUM_TMPL = '<c r="{ref}"><v>{v}</v></c>'
+STR_TMPL = '<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{v}</t></is></c>'
+BOOL_TMPL = '<c r="{ref}" t="b"><v>{v}</v></c>'
+HEADER_TMPL = '<c r="{ref}" s="1" t="inlineStr"><is><t>{v}</t></is></c>'
+# Control characters are not allowed in XML 1.0
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
 
-    return documents_dict
+def _column_letter(idx):
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _xlsx_text(value):
+    return escape(_XML_ILLEGAL.sub("", str(value)))
+
+
+def _is_missing(value):
+    """None, NaN, NaT and pd.NA (nullable Int64/Float64/boolean columns)."""
+    return is_scalar(value) and pd.isna(value)
+
+
+def _number_cell(ref, value):
+    if _is_missing(value):
+        return ""
+    if isinstance(value, float):
+        if not math.isfinite(value):  # Infinities are left empty
+            return ""
+        value = repr(float(value))
+    return NUM_TMPL.format(ref=ref, v=value)
+
+
+def _value_cell(ref, value):
+    """Cell of an object or bool column: numbers and booleans keep their type, the rest is text."""
+    if _is_missing(value):
+        return ""
+    if isinstance(value, (bool, np.bool_)):
+        return BOOL_TMPL.format(ref=ref, v=int(value))
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return _number_cell(ref, value)
+    return STR_TMPL.format(ref=ref, v=_xlsx_text(value))
+
+
+def _column_lists(df):
+    """Columns as lists of Python scalars, converted once per column instead of per cell."""
+    return [df.iloc[:, i].tolist() for i in range(df.shape[1])]
+
+
+def _to_excel_xlsxwriter(df):
+    """Convert DataFrame to xlsx with xlsxwriter's constant_memory mode."""
+    output = io.BytesIO()
+    # constant_memory flushes each row as soon as the next one starts, which needs
+    # strictly row-ordered writes, so rows are written here instead of df.to_excel
+    workbook = xlsxwriter.Workbook(
+        output,
+        {"constant_memory": True, "default_date_format": "yyyy-mm-dd hh:mm:ss"},
+    )
+    worksheet = workbook.add_worksheet("Sheet1")
+    worksheet.write_row(
+        0,
+        0,
+        [str(column) for column in df.columns],
+        workbook.add_format({"bold": True}),
+    )
+    # Missing values (NaN, NaT) become empty cells
+    values = df.astype(object).where(df.notna(), None)
+    for r, row in enumerate(zip(*_column_lists(values)), start=1):
+        worksheet.write_row(r, 0, row)
+    workbook.close()
+    output.seek(0)
+    return output
 
 
 def to_excel(df):
+    """Convert DataFrame to an in-memory xlsx file, writing the worksheet XML directly."""
+    # Exporting a MultiIndex frame is a known pandas slow path, flatten it first
+    if isinstance(df.index, pd.MultiIndex):
+        df = df.reset_index()
+    # Dates need number formats, leave those tables to xlsxwriter
+    if any(dtype.kind in "mM" for dtype in df.dtypes):
+        return _to_excel_xlsxwriter(df)
+
+    letters = [_column_letter(i) for i in range(len(df.columns))]
+    # Numeric columns take the number template for every cell, others dispatch per value
+    writers = [
+        _number_cell if kind in "iuf" else _value_cell
+        for kind in (dtype.kind for dtype in df.dtypes)
+    ]
+
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Sheet1")
-    processed_data = output.getvalue()
-    return processed_data
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _XLSX_WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _XLSX_STYLES)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(_SHEET_HEAD.encode())
+            header = "".join(
+                HEADER_TMPL.format(ref=f"{letter}1", v=_xlsx_text(column))
+                for letter, column in zip(letters, df.columns)
+            )
+            sheet.write(ROW_TMPL.format(r=1, cells=header).encode())
+            for r, row in enumerate(zip(*_column_lists(df)), start=2):
+                cells = "".join(
+                    write(f"{letter}{r}", value)
+                    for write, letter, value in zip(writers, letters, row)
+                )
+                sheet.write(ROW_TMPL.format(r=r, cells=cells).encode())
+            sheet.write(_SHEET_TAIL.encode())
+
+    # st.download_button accepts the file object and reads it with getvalue() itself
+    output.seek(0)
+    return output
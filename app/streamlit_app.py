@@ -2,12 +2,14 @@ import sys
 from io import BytesIO
 
 import asyncio
+import numpy as np
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 from st_on_hover_tabs import on_hover_tabs
 
 sys.stdout.reconfigure(line_buffering=True)
+import threading
 import time
 import uuid
 
@@ -16,97 +18,70 @@ from src.utils import (
     create_documents_dict,
     create_table,
     process_lists,
+    split_items,
+    to_excel,
 )
-from graphs.metrics_graph import websearch_graph
-from graphs.table_graph import one_metrics_graph
-from graphs.websearch_tool_graph import one_metrics_graph_tool
 
 load_dotenv()
 
 logger = initialize_logger("streamlit_app")
 
 
+@st.cache_resource
+def get_event_loop():
+    """Event loop running in a background thread for the lifetime of the app."""
+    # One loop shared by all reruns keeps HTTP connection pools and clients warm
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="async-loop", daemon=True).start()
+    return loop
+
+
 def run_async(coro):
     """Helper function to run async code in Streamlit."""
-    # Create a new event loop for each call (Streamlit runs in a new thread per request)
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
 
 
 st.set_page_config(layout="wide", page_title="Company Researcher")
-# change tab fontsize
-css_tabs = """
+# Rules the theme in .streamlit/config.toml cannot express, re-sent on each rerun
+APP_CSS = """
 <style>
+    /* change tab fontsize */
     .stTabs [data-baseweb="tab-list"] button [data-testid="stMarkdownContainer"] p {
     font-size:2rem;
     }
-</style>
-"""
-
-st.markdown(css_tabs, unsafe_allow_html=True)
-
 
-# change fontsize
-css = """
-<style>
+    /* change fontsize */
     .st-emotion-cache-q8sbsg p {
         font-size: 25px;
     }
-</style>
-"""
-
-st.markdown(css, unsafe_allow_html=True)
 
-# change font
-css = """
-<style>
+    /* change font */
     .st-emotion-cache-q8sbsg {
         font-family: Pragmatica;
     }
+
+    /* hide made by streamlit */
+    footer {visibility: hidden;}
 </style>
 """
-st.markdown(css, unsafe_allow_html=True)
 
+st.html(APP_CSS)
 
-# change sidebar color
-st.markdown(
-    """
-<style>
-    [data-testid=stSidebar] {
-        background-color: #111;
-    }
-</style>
-""",
-    unsafe_allow_html=True,
-)
 
-# hide made by streamlit
-hide_streamlit_style = """
-            <style>
-            #MainMenu {visibility: hidden;}
-            footer {visibility: hidden;}
-            </style>
-            """
-st.markdown(hide_streamlit_style, unsafe_allow_html=True)
-
-
-@st.cache_data
-def to_excel(df):
-    """Convert DataFrame to Excel with formatting."""
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine="xlsxwriter")
-    df.to_excel(writer, index=False, sheet_name="Sheet1")
-    workbook = writer.book
-    worksheet = writer.sheets["Sheet1"]
-    format1 = workbook.add_format({"num_format": "0.00"})
-    worksheet.set_column("A:A", None, format1)
-    writer.close()
-    processed_data = output.getvalue()
-    return processed_data
+def build_init_table(companies, metrics):
+    """Empty table to fill: a company column followed by one column per metric."""
+    # Repeated metrics, or one named "company", map to a single column
+    columns = list(dict.fromkeys(["company", *metrics]))
+    # One object block instead of a list and a Series per metric
+    values = np.full((len(companies), len(columns)), "", dtype=object)
+    values[:, 0] = companies
+    return pd.DataFrame(values, columns=columns)
+
+
+@st.cache_data(max_entries=16)
+def read_metrics_file(content):
+    """Parse an uploaded metrics workbook; re-uploads of the same file hit the cache."""
+    return pd.read_excel(BytesIO(content), sheet_name=0)
 
 
 ################################################ STREAMLIT APP ################################################
@@ -123,7 +98,11 @@ with st.sidebar:
     )
 
 
+# Graphs are imported in the tab that uses them, so a rerun only loads what it needs
 if selected == "Full search":
+    from graphs.metrics_graph import websearch_graph
+    from src.parsing_utils import release_thread_store
+
     st.header("Full search")
 
     with st.expander("What is full search?"):
@@ -151,6 +130,8 @@ if selected == "Full search":
             except Exception as e:
                 logger.error(f"error in invoke: {e}")
                 final_state = {}
+            finally:
+                release_thread_store(config["configurable"]["thread_id"])
 
             generation = final_state.get("generation")
             documents_raw = final_state.get("documents", [])
@@ -162,6 +143,9 @@ if selected == "Full search":
 
 
 if selected == "Table format":
+    from graphs.table_graph import one_metrics_graph
+    from graphs.websearch_tool_graph import one_metrics_graph_tool
+
     st.header("Table format")
 
     with st.expander("What is the input format?"):
@@ -183,7 +167,10 @@ if selected == "Table format":
 
     if uploaded_metrics is not None:
         try:
-            st.session_state["init_table"] = pd.read_excel(uploaded_metrics)
+            st.session_state["init_table"] = read_metrics_file(
+                uploaded_metrics.getvalue()
+            )
+            st.session_state["init_table_key"] = None
             st.session_state["init_table"].columns = ["company"] + st.session_state[
                 "init_table"
             ].columns.tolist()[1:]
@@ -196,35 +183,23 @@ if selected == "Table format":
             autocomplete="off",
         )
 
-        companies_list = [
-            company.strip()
-            for company in st.session_state["init_table_companies"].split("++")
-            if company.strip()
-        ]
+        companies_list = split_items(st.session_state["init_table_companies"])
 
         st.session_state["init_table_metrics"] = st.text_input(
             "Enter metrics: (separated by '++')",
             value=st.session_state["init_table_metrics"],
             autocomplete="off",
         )
-        metrics_list = [
-            metric.strip()
-            for metric in st.session_state["init_table_metrics"].split("++")
-            if metric.strip()
-        ]
+        metrics_list = split_items(st.session_state["init_table_metrics"])
 
         if companies_list and metrics_list:
-            data = {metric: [""] * len(companies_list) for metric in metrics_list}
-            data["company"] = companies_list
-            st.session_state["init_table"] = pd.DataFrame(data)
-            st.session_state["init_table"] = st.session_state["init_table"][
-                ["company"]
-                + [
-                    col
-                    for col in st.session_state["init_table"].columns
-                    if col != "company"
-                ]
-            ]
+            # Rebuild the table only when the entered items change
+            init_table_key = (tuple(companies_list), tuple(metrics_list))
+            if st.session_state.get("init_table_key") != init_table_key:
+                st.session_state["init_table"] = build_init_table(
+                    companies_list, metrics_list
+                )
+                st.session_state["init_table_key"] = init_table_key
         elif st.session_state["init_table"] is None:
             st.session_state["init_table"] = None
 
@@ -282,22 +257,48 @@ if selected == "Table format":
                     st.error(f"Error processing table: {e}")
                     result_list = []
 
-                result_df = create_table(result_list)
-                st.dataframe(result_df)
-                excel_data = to_excel(result_df)
-                _, main_col, _ = st.columns(3)
-                with main_col:
-                    st.download_button(
-                        label="📥 Download Excel",
-                        data=excel_data,
-                        file_name=f"table_filled_{project_name}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        on_click=lambda: st.session_state.update(
-                            {"download_triggered": True}
-                        ),
-                    )
-                if st.session_state.get("download_triggered"):
-                    st.session_state["download_triggered"] = False
+                st.session_state["result_df"] = create_table(result_list)
+                st.session_state["result_version"] = (
+                    st.session_state.get("result_version", 0) + 1
+                )
+
+        # Results persist across reruns, the xlsx is built once per result version
+        if st.session_state.get("result_df") is not None:
+            result_df = st.session_state["result_df"]
+            st.dataframe(result_df)
+            if (
+                st.session_state.get("excel_version")
+                != st.session_state["result_version"]
+            ):
+                st.session_state["excel_file"] = to_excel(result_df)
+                # CSV skips the xlsx codec entirely, for users who just want the data
+                st.session_state["csv_bytes"] = result_df.to_csv(index=False).encode(
+                    "utf-8"
+                )
+                st.session_state["excel_version"] = st.session_state["result_version"]
+            _, excel_col, csv_col, _ = st.columns(4)
+            with excel_col:
+                st.download_button(
+                    label="📥 Download Excel",
+                    data=st.session_state["excel_file"],
+                    file_name=f"table_filled_{project_name}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    on_click=lambda: st.session_state.update(
+                        {"download_triggered": True}
+                    ),
+                )
+            with csv_col:
+                st.download_button(
+                    label="📄 Download CSV",
+                    data=st.session_state["csv_bytes"],
+                    file_name=f"table_filled_{project_name}.csv",
+                    mime="text/csv",
+                    on_click=lambda: st.session_state.update(
+                        {"download_triggered": True}
+                    ),
+                )
+            if st.session_state.get("download_triggered"):
+                st.session_state["download_triggered"] = False
 
     else:
         st.warning("Please upload/create a table to fill")
@@ -0,0 +1,51 @@
+import openpyxl
+import pandas as pd
+
+from src.utils import split_items, to_excel
+
+
+def test_to_excel_nullable_int_with_na():
+    df = pd.DataFrame(
+        {
+            "company": ["a", "b", "c"],
+            "value": pd.array([1, pd.NA, 3], dtype="Int64"),
+            "comment": pd.array(["x", pd.NA, "z"], dtype="string"),
+        }
+    )
+
+    worksheet = openpyxl.load_workbook(to_excel(df)).active
+
+    assert list(worksheet.values) == [
+        ("company", "value", "comment"),
+        ("a", 1, "x"),
+        ("b", None, None),
+        ("c", 3, "z"),
+    ]
+
+
+def test_to_excel_bool_cells():
+    df = pd.DataFrame(
+        {
+            "flag": [True, False],
+            "nullable": pd.array([True, pd.NA], dtype="boolean"),
+            "mixed": ["yes", False],
+        }
+    )
+
+    worksheet = openpyxl.load_workbook(to_excel(df)).active
+
+    assert list(worksheet.values) == [
+        ("flag", "nullable", "mixed"),
+        (True, True, "yes"),
+        (False, None, False),
+    ]
+    assert worksheet["A2"].data_type == "b"
+
+
+def test_split_items_splits_on_every_double_plus():
+    # "++" is always a separator, so "C++ Corp" becomes two items
+    assert split_items("Acme ++ C++ Corp") == ["Acme", "C", "Corp"]
+
+
+def test_split_items_keeps_single_plus_and_drops_empty_items():
+    assert split_items(" A+B ++++ Google ++ ") == ["A+B", "Google"]